@@ -1,6 +1,5 @@
 import logging
 import pandas as pd
-import numpy as np
 import trackpy as track
 
 # Configure the logging level and format
@@ -29,14 +28,14 @@ def generate_velodromes(velodrome_inputs):
         name = inputs["name"]
 
         logging.info(f"Constructing {name}")
-        velodrome = track.velodrome.Velodrome(
+        velodrome = track.velodrome_cache.load_or_build(
             inputs["name"],
             center_utm=inputs["center_utm"],
             rotation=inputs["rotation"],
             elevation=inputs["elevation"],
             length=250,
             precision=0.1,
-            start_finish=np.round(np.pi * 27.7 + 2 * 38, decimals=1),
+            start_finish=track.velodrome.DEFAULT_START_FINISH,
         )
         logging.info(f"Succesfully constructed {name}")
 
@@ -1,4 +1,3 @@
-import numpy as np
 import pandas as pd
 import pathlib
 import logging
@@ -31,11 +30,11 @@ else:
 velodrome_csv = pathlib.Path("eddy_merckx_wielercentrum_wgs84.csv")
 name = ("Eddy Merckx Wielercentrum",)
 elevation = 7
-start_finish = np.round(np.pi * 27.7 + 2 * 38, decimals=1)
+start_finish = track.velodrome.DEFAULT_START_FINISH
 
 # construct Velodrome from scratch
 if not velodrome_csv.is_file():
-    wielercentrum = track.velodrome.Velodrome(
+    wielercentrum = track.velodrome_cache.load_or_build(
         name,
         center_utm=(548540.34, 5655259.58),
         rotation=-18,
@@ -1,3 +1,4 @@
 from .velodrome import *
+from .velodrome_cache import *
 from .io import *
 from .transponder import *
@@ -0,0 +1,90 @@
+import hashlib
+import os
+import pathlib
+import pickle
+
+import pandas as pd
+
+
+def cache_dir():
+    """
+    Return the directory used to cache trackpy results on disk.
+
+    Returns
+    -------
+    pathlib.Path
+        `$XDG_CACHE_HOME/trackpy` if the environment variable is set, `~/.cache/trackpy` otherwise.
+    """
+
+    root = os.environ.get("XDG_CACHE_HOME") or pathlib.Path.home() / ".cache"
+
+    return pathlib.Path(root) / "trackpy"
+
+
+def cache_file(subdirectory, *key):
+    """
+    Return the file caching the result identified by `key`.
+
+    Parameters
+    ----------
+    subdirectory : str
+        Subdirectory of `cache_dir()` holding this kind of result.
+    *key
+        Values identifying the result, their `repr` is hashed. The pandas version
+        is always part of the key, as pickles are only read back by the pandas
+        version that wrote them.
+
+    Returns
+    -------
+    pathlib.Path
+        Path of the pickle file in `cache_dir() / subdirectory`.
+    """
+
+    digest = hashlib.blake2b(repr(key + (pd.__version__,)).encode()).hexdigest()
+
+    return cache_dir() / subdirectory / f"{digest[:16]}.pkl"
+
+
+def load_or_compute(filename, compute, token=None):
+    """
+    Load a result from a pickle file or compute it and pickle it to the file.
+
+    Parameters
+    ----------
+    filename : pathlib.Path
+        The pickle file, see `cache_file`.
+    compute : callable
+        Function without arguments computing the result.
+    token : object, optional
+        Stored alongside the result, a cached result is only reused when its token
+        equals `token`. Otherwise the result is computed again and overwrites the
+        file. Default is None.
+
+    Returns
+    -------
+    object
+        The result, either loaded from the file or freshly computed.
+
+    Notes
+    -----
+    When the file can't be read or written, the result is computed without caching.
+    """
+
+    try:
+        if filename.is_file():
+            cached_token, result = pd.read_pickle(filename)
+
+            if cached_token == token:
+                return result
+    except (OSError, EOFError, pickle.UnpicklingError):
+        pass
+
+    result = compute()
+
+    try:
+        filename.parent.mkdir(parents=True, exist_ok=True)
+        pd.to_pickle((token, result), filename)
+    except OSError:
+        pass
+
+    return result
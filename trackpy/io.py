@@ -1,10 +1,44 @@
 from xml.etree import ElementTree
 
-import gpxpy
-import gpxpy.gpx
+import numpy as np
 import pandas as pd
 import sweat
 
+# write GPX files through a 1 MiB buffer to limit the number of write syscalls
+_WRITE_BUFFER_SIZE = 1 << 20
+
+_TRACKPOINT_EXTENSION_NAMESPACE = (
+    "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
+)
+
+_GPX_HEADER = (
+    '<?xml version="1.0" encoding="UTF-8"?>\n'
+    '<gpx xmlns="http://www.topografix.com/GPX/1/1" '
+    'xmlns:xsi="http://www.w3.org/2001/XMLSchema-instance" '
+    f'xmlns:gpxtpx="{_TRACKPOINT_EXTENSION_NAMESPACE}" '
+    'xsi:schemaLocation="http://www.topografix.com/GPX/1/1 '
+    'http://www.topografix.com/GPX/1/1/gpx.xsd" '
+    'version="1.1" creator="trackpy">\n'
+    "  <trk>\n"
+    "    <trkseg>\n"
+)
+_GPX_FOOTER = "    </trkseg>\n  </trk>\n</gpx>\n"
+
+_TRKPT_FORMAT = '      <trkpt lat="%s" lon="%s">%s<time>%s</time>%s</trkpt>\n'
+_ELEVATION_FORMAT = "<ele>%s</ele>"
+# complete <extensions> element of a track point, the header declares the namespace
+_HEARTRATE_EXTENSIONS_FORMAT = (
+    "<extensions><gpxtpx:TrackPointExtension>"
+    "<gpxtpx:hr>%d</gpxtpx:hr>"
+    "</gpxtpx:TrackPointExtension></extensions>"
+)
+# standalone extension element declaring its own namespace, appended by gpxpy
+_HEARTRATE_ELEMENT_FORMAT = (
+    f'<gpxtpx:TrackPointExtension xmlns:gpxtpx="{_TRACKPOINT_EXTENSION_NAMESPACE}">'
+    "<gpxtpx:hr>%d</gpxtpx:hr>"
+    "</gpxtpx:TrackPointExtension>"
+)
+
 
 def read_fit(
     file, tz="Europe/Brussels", hr=True, cadence=True, calories=True, lap=True
@@ -51,6 +85,50 @@ def read_fit(
     return fit[columns]
 
 
+def _heartrate_extensions(heartrates, template):
+    """
+    Format the heart rate extension of every track point in a single pass.
+
+    Parameters
+    ----------
+    heartrates : list of int
+        List of heart rates for each track point.
+    template : str
+        printf-style template with a single `%d` placeholder for the heart rate.
+
+    Returns
+    -------
+    np.ndarray of str
+        The formatted extension per track point, or an empty string where the heart rate is missing or zero.
+    """
+
+    heartrates = pd.Series(heartrates, dtype=float).fillna(0).to_numpy(dtype=int)
+
+    return np.where(heartrates > 0, np.char.mod(template, heartrates), "")
+
+
+def _elevation_elements(elevations):
+    """
+    Format the elevation element of every track point in a single pass.
+
+    Parameters
+    ----------
+    elevations : list of float
+        List of elevations for each track point.
+
+    Returns
+    -------
+    np.ndarray of str
+        The formatted `<ele>` element per track point, or an empty string where the elevation is missing.
+    """
+
+    elevations = pd.Series(elevations, dtype=object)
+
+    return np.where(
+        elevations.isna(), "", np.char.mod(_ELEVATION_FORMAT, elevations.to_numpy())
+    )
+
+
 def construct_gpx(latitudes, longitudes, times, elevations, heartrates, cadences):
     """
     Construct a GPX (GPS Exchange Format) object from provided data.
@@ -75,7 +153,8 @@ def construct_gpx(latitudes, longitudes, times, elevations, heartrates, cadences
     gpxpy.gpx.GPX
         A GPX object containing the track points with the provided latitudes, longitudes, times, elevations, heart rates, and cadences.
     """
-    
+    import gpxpy.gpx
+
     gpx = gpxpy.gpx.GPX()
 
     # Create first track in our GPX:
@@ -86,40 +165,79 @@ def construct_gpx(latitudes, longitudes, times, elevations, heartrates, cadences
     gpx_segment = gpxpy.gpx.GPXTrackSegment()
     gpx_track.segments.append(gpx_segment)
 
-    for lat, long, time, elevation, heartrate, cadence in zip(
-        latitudes, longitudes, times, elevations, heartrates, cadences
+    # register the extension namespace once, extensions refer to it by uri
+    gpx.nsmap = {"gpxtpx": _TRACKPOINT_EXTENSION_NAMESPACE}
+    extensions = _heartrate_extensions(heartrates, _HEARTRATE_ELEMENT_FORMAT)
+
+    for lat, long, time, elevation, extension in zip(
+        latitudes, longitudes, times, elevations, extensions
     ):
         gpx_point = gpxpy.gpx.GPXTrackPoint(
             latitude=lat, longitude=long, time=time, elevation=elevation
         )
 
-        if heartrate:
+        if extension:
             # create extension element
-            namespace = "{gpxpy}"
-            nsmap = {
-                namespace[
-                    1:-1
-                ]: "http://www.garmin.com/xmlschemas/TrackPointExtension/v1"
-            }
-            gpx.nsmap = nsmap
-
-            track_point_extensions = ElementTree.Element(
-                f"{namespace}TrackPointExtension"
-            )
-            hr = ElementTree.SubElement(
-                track_point_extensions,
-                f"{namespace}hr",
-            )
-            hr.text = str(heartrate)
-
-            gpx_point.extensions.append(track_point_extensions)
+            gpx_point.extensions.append(ElementTree.fromstring(extension))
 
         gpx_segment.points.append(gpx_point)
         
     return gpx
 
 
-def write_gpx(filename, interpolation, fit=None, velodrome=None):
+def iter_gpx(latitudes, longitudes, times, elevations, heartrates, chunksize=10_000):
+    """
+    Format track points as a GPX (GPS Exchange Format) document, chunk by chunk, without building an object tree.
+
+    Each chunk of track points is formatted with a single string interpolation over
+    the flattened columns, which avoids constructing a gpxpy object per point and
+    never holds the whole document in memory.
+
+    Parameters
+    ----------
+    latitudes : list of float
+        List of latitudes for each track point.
+    longitudes : list of float
+        List of longitudes for each track point.
+    times : pd.Series of datetime
+        Series of timestamps for each track point. Timezone aware timestamps are written in UTC.
+    elevations : list of float
+        List of elevations for each track point. Missing elevations are omitted.
+    heartrates : list of int
+        List of heart rates for each track point. Missing or zero heart rates are omitted.
+    chunksize : int, optional
+        Number of track points formatted per chunk. Default is 10000.
+
+    Yields
+    ------
+    str
+        The GPX header, the formatted track points per chunk and finally the GPX footer.
+    """
+
+    times = pd.Series(times)
+    if times.dt.tz is not None:
+        times = times.dt.tz_convert("UTC")
+
+    extensions = _heartrate_extensions(heartrates, _HEARTRATE_EXTENSIONS_FORMAT)
+
+    n = len(extensions)
+    columns = np.empty((n, 5), dtype=object)
+    columns[:, 0] = np.asarray(latitudes, dtype=float)
+    columns[:, 1] = np.asarray(longitudes, dtype=float)
+    columns[:, 2] = _elevation_elements(elevations)
+    columns[:, 3] = times.dt.strftime("%Y-%m-%dT%H:%M:%SZ").to_numpy()
+    columns[:, 4] = extensions
+
+    yield _GPX_HEADER
+
+    for start in range(0, n, chunksize):
+        chunk = columns[start : start + chunksize]
+        yield (_TRKPT_FORMAT * len(chunk)) % tuple(chunk.ravel())
+
+    yield _GPX_FOOTER
+
+
+def write_gpx(filename, interpolation, fit=None, velodrome=None, legacy=False):
     """
     Write GPX (GPS Exchange Format) data to a file based on provided interpolation and optional fit data.
 
@@ -133,6 +251,8 @@ def write_gpx(filename, interpolation, fit=None, velodrome=None):
         DataFrame containing optional fit data with columns 'datetime', 'heartrate', 'cadence', and 'lap'. Default is None.
     velodrome : Velodrome, optional
         A Velodrome object containing the velodrome's geometry and elevation. Default is None.
+    legacy : bool, optional
+        Whether to build the GPX document with gpxpy instead of formatting it directly, requires gpxpy. Default is False.
 
     Returns
     -------
@@ -141,12 +261,25 @@ def write_gpx(filename, interpolation, fit=None, velodrome=None):
 
     Notes
     -----
-    The function merges the `interpolation` DataFrame with the `fit` DataFrame if provided, and uses elevation from the `velodrome` object if provided.
+    The function aligns the `interpolation` DataFrame with the nearest record of the `fit` DataFrame within 1 second if provided, and uses elevation from the `velodrome` object if provided.
     """
 
     if fit is not None:
-        interpolation = interpolation.merge(
-            fit, left_on="Interpolated time (s)", right_on="datetime", how="left"
+        # merge_asof requires both keys in the same time zone
+        fit = fit.assign(
+            datetime=fit["datetime"].dt.tz_convert(
+                interpolation["Interpolated time (s)"].dt.tz
+            )
+        )
+
+        # align every track point with the nearest fit record, both sorted on time
+        interpolation = pd.merge_asof(
+            interpolation.sort_values("Interpolated time (s)", kind="stable"),
+            fit.sort_values("datetime", kind="stable"),
+            left_on="Interpolated time (s)",
+            right_on="datetime",
+            direction="nearest",
+            tolerance=pd.Timedelta("1s"),
         )
         heartrates = interpolation["heartrate"]
         cadences = interpolation["cadence"]
@@ -164,7 +297,17 @@ def write_gpx(filename, interpolation, fit=None, velodrome=None):
     longitudes = interpolation["Longitude (WGS84)"]
     times = interpolation["Interpolated time (s)"]
 
-    gpx = construct_gpx(latitudes, longitudes, times, elevations, heartrates, cadences)
-    
-    with open(filename, "w") as f:
-        f.write(gpx.to_xml())
+    if legacy:
+        gpx = construct_gpx(
+            latitudes, longitudes, times, elevations, heartrates, cadences
+        )
+
+        with open(filename, "w", buffering=_WRITE_BUFFER_SIZE) as f:
+            f.write(gpx.to_xml())
+
+        return
+
+    # stream the document, chunks are written as soon as they are formatted
+    with open(filename, "wb", buffering=_WRITE_BUFFER_SIZE) as f:
+        for chunk in iter_gpx(latitudes, longitudes, times, elevations, heartrates):
+            f.write(chunk.encode())
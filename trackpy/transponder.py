@@ -1,5 +1,14 @@
+import functools
+import os
+
+import numpy as np
 import pandas as pd
 
+from .cache import cache_file, load_or_compute
+
+# part of the cache key, increment when read_transponder or interpolate change their output
+_PARSE_CACHE_VERSION = 1
+
 
 def read_transponder(filename=None, length=250, sessions=None):
     """
@@ -43,42 +52,48 @@ def read_transponder(filename=None, length=250, sessions=None):
     The input CSV file should be encoded in 'utf-16-le' and should contain the following columns:
     - 'Date': The date of the lap
     - 'Start time': The start time of the lap
-    - 'Total time': The total time taken for the lap
+    - 'Total time': The total time taken for the lap (not read)
     - 'Laptime': The time taken for the lap
     - 'Speed': The average speed during the lap in km/h
     - 'Lap': The lap number
-    - 'Diff': The time difference from the previous lap
-    - 'Transponder': The transponder ID
+    - 'Diff': The time difference from the previous lap (not read)
+    - 'Transponder': The transponder ID (not read)
 
     """
-    df = pd.read_csv(filename, encoding="utf-16-le").dropna(how="all")
+    # only parse the columns that are used, as strings to skip type inference
+    columns = ["Date", "Start time", "Laptime", "Speed", "Lap"]
+    df = pd.read_csv(
+        filename,
+        encoding="utf-16-le",
+        usecols=columns,
+        dtype={column: str for column in columns if column != "Lap"},
+    ).dropna(how="all")
 
     # add time and date
     df["Timestamp"] = pd.to_datetime(
-        df[["Date", "Start time"]].agg(" ".join, axis=1), format="%d-%m-%Y %H:%M:%S"
+        df["Date"].str.cat(df["Start time"], sep=" "),
+        format="%d-%m-%Y %H:%M:%S",
+        cache=True,
     )
 
-    # convert objects to floats (decimal seconds)
-    for column in ["Total time", "Laptime"]:
-        df[column] = pd.to_timedelta(df[column]).dt.total_seconds()
+    # convert object to floats (decimal seconds)
+    df["Laptime"] = pd.to_timedelta(df["Laptime"]).dt.total_seconds()
 
     # convert lap to int
     df["Lap"] = df["Lap"].astype(int)
 
     # add sessions
-    df["Session"] = (df["Lap"] != df["Lap"].shift(1) + 1).cumsum()
+    df["Session"] = (df["Lap"] != df["Lap"].shift(1) + 1).cumsum().astype("int32")
 
     # filter on desired sessions
     if sessions:
-        df = df.query("Session in @sessions").copy()
-
-    # convert speed string to float
-    df["Speed"] = df["Speed"].str.replace(" km/h", "").astype(float) / 3.6
+        df = df[df["Session"].isin(sessions)]
 
-    # remove unnecessary or processed columns
-    df = df.drop(columns=["Date", "Start time", "Diff", "Transponder"])
+    # convert speed string to float, every speed ends with the 5 characters " km/h"
+    # assign returns a new frame, so the filtered selection doesn't need a copy
+    df = df.assign(Speed=df["Speed"].str.slice(stop=-5).astype(float) / 3.6)
 
-    # reorder columns
+    # select and reorder columns, dropping processed columns
     df = df[
        [
            "Timestamp",
@@ -140,8 +155,7 @@ def _add_missing_observations(lap_distances):
             Timestamp_after_last_round=lap_distances["Timestamp"]
             + pd.to_timedelta(lap_distances["Laptime (s)"], unit="seconds")
         )
-        .reset_index()
-        .groupby("Session")
+        .groupby("Session", sort=False)
         .agg(
             first_time=pd.NamedAgg("Timestamp", "min"),
             last_time=pd.NamedAgg("Timestamp_after_last_round", "max"),
@@ -151,20 +165,102 @@ def _add_missing_observations(lap_distances):
     pause_length = (
         (gby["first_time"].shift(-1) - gby["last_time"]).dt.total_seconds().dropna()
     )
-    for session, seconds in zip(pause_length.index, pause_length.values):
-        seconds = int(seconds)
-        last_observation = lap_distances.query("Session == @session").tail(1).copy()
-        last_observation.loc[
-            last_observation.index, ["Laptime (s)", "Average speed (m/s)"]
-        ] = 0
+    # last observation of every session, the rider is stationary during the pause
+    last_observations = (
+        lap_distances.groupby("Session", sort=False)
+        .tail(1)
+        .assign(**{"Laptime (s)": 0.0, "Average speed (m/s)": 0.0})
+    )
 
-        extra_observations = pd.concat([last_observation] * seconds)
+    # repeat the last observation of every session once for every paused second
+    positions = pd.Index(last_observations["Session"]).get_indexer(pause_length.index)
+    seconds = np.maximum(pause_length.to_numpy().astype(int), 0)
+    extra_observations = last_observations.take(np.repeat(positions, seconds))
 
-        lap_distances = pd.concat([lap_distances, extra_observations]).fillna(0)
+    lap_distances = pd.concat([lap_distances, extra_observations]).fillna(0)
 
     return lap_distances
 
 
+def _interpolate_distance(speeds, length=250):
+    """
+    Calculate the cumulative distance and the distance covered on the velodrome.
+
+    Observations are one second apart, so the distance travelled between two
+    consecutive observations equals the average speed of the latter. The
+    distance covered on the velodrome is the cumulative distance modulo the
+    track length.
+
+    Parameters
+    ----------
+    speeds : np.ndarray
+        Average speed in meters per second for every observation.
+    length : int, optional
+        The length of the track in meters. The default is 250.
+
+    Returns
+    -------
+    tuple of np.ndarray
+        The cumulative distance in meters and the distance covered on the
+        velodrome in meters, rounded to 0.1 meter.
+    """
+    steps = speeds.copy()
+    steps[:1] = 0
+
+    distance = np.cumsum(steps)
+
+    # modulo on whole decimeters, avoids floating point rounding at the finish line
+    decimeters = np.rint(distance * 10).astype(np.int64) % int(round(length * 10))
+    distance_covered = decimeters / 10
+
+    return distance, distance_covered
+
+
+def _sort_order(sessions, laps, timestamps):
+    """
+    Determine the order that sorts observations by session, lap and timestamp.
+
+    The three columns are packed into a single int64 key, so only one stable
+    sort is needed. Falls back to `np.lexsort` when the key doesn't fit.
+
+    Timestamps are compared at whole-second resolution, observations within the
+    same second keep their input order. This is only safe because
+    `read_transponder` parses timestamps with the format `%H:%M:%S`, it is not a
+    general sort on three columns.
+
+    Parameters
+    ----------
+    sessions : np.ndarray
+        Session ID of every observation.
+    laps : np.ndarray
+        Lap number of every observation.
+    timestamps : np.ndarray
+        Timestamp of every observation as datetime64[ns], truncated to whole seconds.
+
+    Returns
+    -------
+    np.ndarray
+        Positions of the observations in sorted order.
+    """
+    # offset all columns to start at 0 and count the bits needed for each of them
+    columns = [
+        sessions.astype(np.int64),
+        laps.astype(np.int64),
+        timestamps.view(np.int64) // 1_000_000_000,
+    ]
+    columns = [column - column.min() for column in columns]
+    bits = [int(column.max()).bit_length() for column in columns]
+
+    if sum(bits) > 63:
+        # lexsort sorts on the last key first
+        return np.lexsort(columns[::-1])
+
+    session, lap, seconds = columns
+    key = (session << (bits[1] + bits[2])) | (lap << bits[2]) | seconds
+
+    return np.argsort(key, kind="stable")
+
+
 def interpolate(lap_distances, length=250, tz="Europe/Brussels"):
     """
     Interpolate lap data to generate more granular observations.
@@ -200,72 +296,49 @@ def interpolate(lap_distances, length=250, tz="Europe/Brussels"):
     -----
     The function performs several steps to interpolate the data:
     1. Rounds lap times to the nearest second.
-    2. Adds counters to keep track of interpolated values.
+    2. Repeats every lap once for every second it took.
     3. Adds observations for paused seconds using `_add_missing_observations`.
     4. Sorts the DataFrame and calculates intermediate distances and times.
-    5. Localizes the timestamps to the given time zone.
+    5. Localizes the start time to the given time zone and adds the elapsed seconds.
 
     """
 
     # trick to copy each row t amount of times where t is the number of seconds needed to complete the quarter
-    lap_distances["Laptime rounded (s)"] = (
-        lap_distances["Laptime (s)"].round(0).astype(int)
-    )
-
-    # add counter to keep track of all interpolated values
-    lap_distances["Distance counter"] = lap_distances["Laptime rounded (s)"].apply(
-        lambda x: list(range(0, x))
-    )
-    lap_distances["Laptime rounded (s)"] = lap_distances["Laptime rounded (s)"].apply(
-        lambda x: [x] * x
-    )
-    lap_distances = lap_distances.explode(["Laptime rounded (s)", "Distance counter"])
+    repeats = lap_distances["Laptime (s)"].round(0).astype(int).to_numpy()
+    lap_distances = lap_distances.take(np.repeat(np.arange(len(repeats)), repeats))
 
     # add observations for every paused second
     lap_distances = _add_missing_observations(lap_distances)
-    lap_distances = lap_distances.sort_values(by=["Session", "Lap", "Timestamp"])
-
-    # add time counter used to determine intermediate distance and total elapsed time
-    lap_distances["Time counter"] = list(range(0, lap_distances.shape[0]))
+    lap_distances = lap_distances.take(
+        _sort_order(
+            lap_distances["Session"].to_numpy(),
+            lap_distances["Lap"].to_numpy(),
+            lap_distances["Timestamp"].to_numpy(),
+        )
+    )
 
-    # calculate intermediate distance
-    lap_distances["Interpolated distance (m)"] = (
-        lap_distances["Time counter"].diff().fillna(0)
-        * lap_distances["Average speed (m/s)"]
-    ).cumsum()
+    # time counter used to determine intermediate distance and total elapsed time
+    time_counter = np.arange(lap_distances.shape[0], dtype=np.int64)
 
-    # calculate distance covered on the velodrome
-    _, distance_covered = lap_distances["Interpolated distance (m)"].divmod(length)
-    lap_distances["Distance covered"] = distance_covered.round(decimals=1)
+    # calculate intermediate distance and distance covered on the velodrome
+    distance, distance_covered = _interpolate_distance(
+        lap_distances["Average speed (m/s)"].to_numpy(dtype=float), length=length
+    )
 
     # highest sampling rate in gpx file is dictated by the timeformat ISO 8601
     # which is 1 second, as such, the counter is actually the number of seconds
     # since the start of the activity
-    lap_distances["Total elapsed interpolated time (s)"] = pd.to_timedelta(
-        lap_distances["Time counter"].apply(lambda x: str(x) + "s")
-    )
-
-    # add intermediate time to starttime of quarter
-    lap_distances["Interpolated time (s)"] = (
-        lap_distances["Timestamp"].iloc[0]
-        + lap_distances["Total elapsed interpolated time (s)"]
-    )
-
-    # convert to correct timezone
-    lap_distances["Interpolated time (s)"] = lap_distances[
-        "Interpolated time (s)"
-    ].dt.tz_localize(tz=tz)
-
-    # remove intermediate columns needed for calculations
-    lap_distances = lap_distances.drop(
-       columns=[
-           "Laptime (s)",
-           "Distance (m)",
-           "Laptime rounded (s)",
-           "Total elapsed interpolated time (s)",
-           "Distance counter",
-           "Time counter",
-       ]
+    # localize the starttime once and add the counter as elapsed seconds
+    origin = lap_distances["Timestamp"].iloc[0].tz_localize(tz=tz)
+    interpolated_time = origin + pd.to_timedelta(time_counter, unit="s")
+
+    # remove columns only needed for calculations and add all new columns at once
+    lap_distances = lap_distances.drop(columns=["Laptime (s)", "Distance (m)"]).assign(
+        **{
+            "Interpolated distance (m)": distance,
+            "Distance covered": distance_covered,
+            "Interpolated time (s)": interpolated_time,
+        }
     )
 
     # between two sessions, the riders leaves the track
@@ -278,8 +351,10 @@ def interpolate(lap_distances, length=250, tz="Europe/Brussels"):
     # due to numerical precision
     # there can be a few observations that start a new lap, which isn't there in reality
     # set distance covered 0 for these observations
-    last_element_above_230 = lap_distances[::-1]["Distance covered"].gt(230).idxmax()
-    lap_distances.loc[last_element_above_230 + 1 :, "Distance covered"] = 0
+    above_230 = np.flatnonzero(lap_distances["Distance covered"].to_numpy() > 230)
+    if above_230.size:
+        column = lap_distances.columns.get_loc("Distance covered")
+        lap_distances.iloc[above_230[-1] + 1 :, column] = 0
 
     return lap_distances
 
@@ -303,9 +378,10 @@ def map_interpolation_to_velodrome(interpolation, velodrome):
         - 'Interpolated time (s)': Interpolated timestamps
     velodrome : Velodrome
         A Velodrome object containing the velodrome's geometry. The object
-        should have an attribute `arc_length_wgs84` which is a DataFrame with
+        should have an attribute `arc_length_wgs84_indexed` which is a DataFrame with
         the following column:
-        - 'Arc length (m)': The arc length at various points on the velodrome in meters
+        - 'Arc length (m)': The arc length at various points on the velodrome in meters,
+          where row i lies at an arc length of i * `velodrome.precision`
 
     Returns
     -------
@@ -319,25 +395,55 @@ def map_interpolation_to_velodrome(interpolation, velodrome):
 
     Notes
     -----
-    The function performs a left join between the `interpolation` DataFrame
-    and the `arc_length_wgs84` DataFrame from the `Velodrome` object based
-    on the 'Distance covered' and 'Arc length (m)' columns.
+    Every row of the `interpolation` DataFrame is matched with the row of the
+    `arc_length_wgs84_indexed` DataFrame from the `Velodrome` object whose
+    'Arc length (m)' is nearest to its 'Distance covered'. As the arc lengths
+    are evenly spaced, the row follows directly from the distance covered.
 
     """
-    arc_length = velodrome.arc_length_wgs84
+    arc_length = velodrome.arc_length_wgs84_indexed
 
     interpolation = interpolation[
         ["Interpolated distance (m)", "Distance covered", "Interpolated time (s)"]
-    ]
+    ].reset_index(drop=True)
 
-    result = interpolation.merge(
-        arc_length, left_on="Distance covered", right_on="Arc length (m)", how="left"
+    # row i of the indexed arc length lies at an arc length of i * precision
+    # so the row of the nearest arc length follows from the distance covered
+    indexer = np.rint(
+        interpolation["Distance covered"].to_numpy() / velodrome.precision
+    ).astype(np.int64) % len(arc_length)
+
+    result = pd.concat(
+        [interpolation, arc_length.iloc[indexer].reset_index(drop=True)], axis=1
     )
 
     return result
 
 
-def parse_transponder(filename, length=250, tz="Europe/Brussels", sessions=None):
+@functools.lru_cache(maxsize=16)
+def _cached_parse_transponder(filename, mtime_ns, length, tz, sessions):
+    """
+    Parse and interpolate transponder data, memoized in memory and on disk.
+
+    Results are pickled to `cache_dir() / "parse"`, one file per csv file and
+    arguments. The modification time is stored with the result, a changed csv
+    file is parsed again and replaces the cached result.
+    """
+
+    return load_or_compute(
+        cache_file("parse", filename, length, tz, sessions, _PARSE_CACHE_VERSION),
+        lambda: interpolate(
+            read_transponder(filename, length=length, sessions=list(sessions)),
+            length=length,
+            tz=tz,
+        ),
+        token=mtime_ns,
+    )
+
+
+def parse_transponder(
+    filename, length=250, tz="Europe/Brussels", sessions=None, cache=True
+):
     """
     Parse and interpolate transponder data from a csv file coming from https://results.sporthive.com.
 
@@ -351,6 +457,9 @@ def parse_transponder(filename, length=250, tz="Europe/Brussels", sessions=None)
         Time zone for timestamps. Default is "Europe/Brussels".
     sessions : list of int, optional
         List of session IDs to filter by. Default is None.
+    cache : bool, optional
+        Whether to reuse the result of an earlier call for the same, unchanged file.
+        Results are kept in memory and on disk in `cache_dir()`. Default is True.
 
     Returns
     -------
@@ -358,6 +467,19 @@ def parse_transponder(filename, length=250, tz="Europe/Brussels", sessions=None)
         DataFrame containing interpolated lap data.
     """
 
+    if cache:
+        filename = os.path.abspath(filename)
+        interpolation = _cached_parse_transponder(
+            filename,
+            os.stat(filename).st_mtime_ns,
+            length,
+            tz,
+            tuple(sessions or ()),
+        )
+
+        # callers may modify the result, keep the cached frame intact
+        return interpolation.copy()
+
     transponder = read_transponder(filename, length=length, sessions=sessions)
     interpolation = interpolate(transponder, length=length, tz=tz)
 
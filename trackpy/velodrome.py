@@ -1,6 +1,38 @@
+import functools
+
 import numpy as np
 import pandas as pd
 
+# start/finish line of a 250 meter velodrome lies after a corner and two straights
+DEFAULT_START_FINISH = float(np.round(np.pi * 27.7 + 2 * 38, decimals=1))
+
+
+@functools.lru_cache(maxsize=None)
+def _get_transformers(utm_zone):
+    """
+    Construct the transformers between UTM and WGS84 coordinates, cached per UTM zone.
+
+    Initializing PROJ objects is expensive, so they are constructed once per zone.
+
+    Returns
+    -------
+    tuple of pyproj.Transformer
+        Transformers from UTM to WGS84 and from WGS84 to UTM.
+    """
+    import pyproj
+
+    # utm are local cartesian coordinates
+    utm = pyproj.Proj(proj="utm", ellps="WGS84", zone=utm_zone)
+
+    # wgs84 is the default coordinate system for gps and geodesy
+    # models the earth as on oblate spheroid instead of a sphere
+    wgs84 = pyproj.Proj("epsg:4326")
+
+    return (
+        pyproj.Transformer.from_proj(utm, wgs84),
+        pyproj.Transformer.from_proj(wgs84, utm),
+    )
+
 
 class BaseVelodrome:
     """
@@ -24,10 +56,13 @@ class BaseVelodrome:
         Precision for calculating the velodrome's geometry. Default is 0.1 meters.
     start_finish : float, optional
         Position of the start/finish line as expressed in meters across the arc length of the velodrome.
+        Default is DEFAULT_START_FINISH.
     arc_length_utm : pd.DataFrame, optional
         DataFrame containing the arc length in UTM coordinates.
     arc_length_wgs84 : pd.DataFrame, optional
         DataFrame containing the arc length in WGS84 coordinates.
+    arc_length_wgs84_indexed : pd.DataFrame
+        `arc_length_wgs84` sorted on arc length, row i lies at an arc length of i * precision.
 
     Methods
     -------
@@ -63,11 +98,12 @@ class BaseVelodrome:
         arc_length_wgs84=None,
         # TO DO
         # calculate this in some easier way for users
-        start_finish=None,
+        start_finish=DEFAULT_START_FINISH,
     ):
         self.name = name
         self.start_finish = start_finish
         self.elevation = elevation
+        self.precision = precision
 
         # coordinates and arc_length is available
         if arc_length_wgs84 is not None:
@@ -98,7 +134,6 @@ class BaseVelodrome:
             self.length = length
             self.rotation = rotation
             # use https://api.open-elevation.com/api/v1/lookup?locations=51.04682000579793,3.69245806519157
-            self.precision = precision
 
             # set corner radius and straight distance and corresponding precision
             self.determine_velodrome_dimensions()
@@ -112,6 +147,11 @@ class BaseVelodrome:
             # determine arc length for both coordinate system
             self.arc_length_utm, self.arc_length_wgs84 = self.calculate_arc_length()
 
+        # order the arc length so row i lies at an arc length of i * precision
+        self.arc_length_wgs84_indexed = self.arc_length_wgs84.sort_values(
+            "Arc length (m)", kind="stable"
+        ).reset_index(drop=True)
+
     def determine_velodrome_dimensions(self):
 
         if self.length == 250:
@@ -130,31 +170,26 @@ class BaseVelodrome:
     def transform_coordinates(
         self, points, from_coor="utm", to_coor="wgs84", utm_zone=31
     ):
-        import pyproj
-
         """
         Zone 31 is Belgium.
         """
 
-        if isinstance(points, tuple):
-            points = [points]
-
-        # utm are local cartesian coordinates
-        utm = pyproj.Proj(proj="utm", ellps="WGS84", zone=utm_zone)
+        # single points and arrays of points are both transformed as (N, 2) arrays
+        single_point = isinstance(points, tuple)
+        points = np.atleast_2d(points)
 
-        # wgs84 is the default coordinate system for gps and geodesy
-        # models the earth as on oblate spheroid instead of a sphere
-        wgs84 = pyproj.Proj("epsg:4326")
+        utm_to_wgs84, wgs84_to_utm = _get_transformers(utm_zone)
 
         if from_coor == "utm":
-            transformer = pyproj.Transformer.from_proj(utm, wgs84)
+            transformer = utm_to_wgs84
         elif from_coor == "wgs84":
-            transformer = pyproj.Transformer.from_proj(wgs84, utm)
+            transformer = wgs84_to_utm
 
-        coordinates = [transformer.transform(x, y) for (x, y) in points]
+        # transform all points in a single call
+        coordinates = np.column_stack(transformer.transform(points[:, 0], points[:, 1]))
 
-        if len(coordinates) == 1:
-            coordinates = coordinates[0]
+        if single_point:
+            coordinates = tuple(coordinates[0].tolist())
 
         return coordinates
 
@@ -168,17 +203,12 @@ class BaseVelodrome:
 
         start = np.pi / 2
         end = 3 * np.pi / 2
-        step = (end - start) / (self.corner_precision - 1)
-        angles = np.arange(start, end + step, step)
+        angles = np.linspace(start, end, self.corner_precision)
 
         x, y = center
-        corner = [
-            (
-                x + corner_radius * np.cos(angle),
-                y + corner_radius * np.sin(angle),
-            )
-            for angle in angles
-        ]
+        corner = np.column_stack(
+            [x + corner_radius * np.cos(angles), y + corner_radius * np.sin(angles)]
+        )
 
         return corner
 
@@ -191,10 +221,10 @@ class BaseVelodrome:
             straight_length = self.straight_length
 
         x, y = start
-        straight = [
-            (x + straight_length * (i / self.straight_precision), y)
-            for i in range(1, self.straight_precision + 1)
-        ]
+        xs = x + straight_length * (
+            np.arange(1, self.straight_precision + 1) / self.straight_precision
+        )
+        straight = np.column_stack([xs, np.full_like(xs, y)])
 
         return straight
 
@@ -204,11 +234,11 @@ class BaseVelodrome:
         angle = np.deg2rad(angle)
         R = np.array([[np.cos(angle), -np.sin(angle)], [np.sin(angle), np.cos(angle)]])
 
-        # matrices with center and points to be rotated
-        c = np.atleast_2d(center)
-        points = np.atleast_2d(points)
+        # rotate the (N, 2) points around the center, row vectors rotate with R.T
+        center = np.asarray(center, dtype=float)
+        points = np.asarray(points, dtype=float)
 
-        return np.squeeze((R @ (points.T - c.T) + c.T).T)
+        return (points - center) @ R.T + center
 
     def build_velodrome(self):
 
@@ -237,7 +267,9 @@ class BaseVelodrome:
         )
         right_corner = self.build_corner(start_right_corner, direction="right")
 
-        velodrome = top_straight + left_corner + bottom_straight + right_corner
+        velodrome = np.concatenate(
+            [top_straight, left_corner, bottom_straight, right_corner]
+        )
 
         if self.rotation != 0:
             velodrome = self.rotate_points(
@@ -245,41 +277,35 @@ class BaseVelodrome:
             )
 
         # set the start of the velodrome at the start/finish line
-        start_finish = int(self.start_finish * 10)
-        velodrome = np.concatenate([velodrome[start_finish:], velodrome[:start_finish]])
+        start_finish = int(round(self.start_finish / self.precision))
+        velodrome = np.roll(velodrome, -start_finish, axis=0)
 
         return velodrome
 
     def calculate_arc_length(self):
 
         # the arc length is the same for both coordinates systems
-        arc_length = np.arange(0, len(self.coordinates_utm) / 10, self.precision)
+        arc_length = np.round(
+            np.arange(len(self.coordinates_utm)) * self.precision, decimals=1
+        )
 
         # utm
-        lat_utm, long_utm = zip(*self.coordinates_utm)
         arc_length_utm = pd.DataFrame(
             data={
-                "Latitude (UTM)": lat_utm,
-                "Longitude (UTM)": long_utm,
+                "Latitude (UTM)": self.coordinates_utm[:, 0],
+                "Longitude (UTM)": self.coordinates_utm[:, 1],
                 "Arc length (m)": arc_length,
             }
         )
-        arc_length_utm["Arc length (m)"] = arc_length_utm["Arc length (m)"].round(
-            decimals=1
-        )
 
         # wgs84
-        lat_wgs84, long_wgs84 = zip(*self.coordinates_wgs84)
         arc_length_wgs84 = pd.DataFrame(
             data={
-                "Latitude (WGS84)": lat_wgs84,
-                "Longitude (WGS84)": long_wgs84,
+                "Latitude (WGS84)": self.coordinates_wgs84[:, 0],
+                "Longitude (WGS84)": self.coordinates_wgs84[:, 1],
                 "Arc length (m)": arc_length,
             }
         )
-        arc_length_wgs84["Arc length (m)"] = arc_length_wgs84["Arc length (m)"].round(
-            decimals=1
-        )
 
         return arc_length_utm, arc_length_wgs84
 
@@ -306,19 +332,19 @@ class Velodrome(BaseVelodrome):
         # velodromes are small, so zoom in to max zoom == 18
         osm_map = folium.Map(location=[self.lat_wgs84, self.long_wgs84], zoom_start=18)
 
-        # add velodrome to map
-        for (lat, lon) in self.coordinates_wgs84[1:]:
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=2,
-                weight=4,
-                color="cornflowerblue",
-            ).add_to(osm_map)
+        # add velodrome to map as a single closed line instead of a marker per point
+        folium.PolyLine(
+            locations=np.vstack(
+                [self.coordinates_wgs84, self.coordinates_wgs84[:1]]
+            ).tolist(),
+            weight=4,
+            color="cornflowerblue",
+        ).add_to(osm_map)
 
         # highlight start/finish in red
         lat_start, lon_start = self.coordinates_wgs84[0]
         folium.CircleMarker(
-            location=[lat, lon], radius=2, weight=4, color="darkblue"
+            location=[lat_start, lon_start], radius=2, weight=4, color="darkblue"
         ).add_to(osm_map)
 
         return osm_map
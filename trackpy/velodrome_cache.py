@@ -0,0 +1,45 @@
+import json
+
+import numpy as np
+
+from .cache import cache_file, load_or_compute
+from .velodrome import Velodrome
+
+# part of the cache key, increment when Velodrome constructs a different geometry
+_GEOMETRY_VERSION = 1
+
+
+def load_or_build(name, **kwargs):
+    """
+    Load a velodrome from the disk cache or construct it from scratch.
+
+    Constructing a velodrome is fully deterministic given its arguments, so the
+    constructed velodrome is pickled to `cache_dir() / "velodrome"`, keyed by the
+    arguments and the geometry version. Later calls with the same arguments
+    skip the construction.
+
+    Parameters
+    ----------
+    name : str
+        Name of the velodrome.
+    **kwargs
+        Keyword arguments passed to `Velodrome`, e.g. `center_utm`, `rotation`,
+        `length`, `precision`, `elevation` and `start_finish`.
+
+    Returns
+    -------
+    Velodrome
+        The velodrome, either loaded from the cache or freshly constructed.
+    """
+
+    # numpy scalars and arrays are hashed as their python equivalents
+    arguments = json.dumps(
+        dict(kwargs, name=name),
+        sort_keys=True,
+        default=lambda value: np.asarray(value).tolist(),
+    )
+
+    return load_or_compute(
+        cache_file("velodrome", arguments, _GEOMETRY_VERSION),
+        lambda: Velodrome(name, **kwargs),
+    )